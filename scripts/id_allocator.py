@@ -0,0 +1,192 @@
+"""
+Bulk ID allocator for the UUID-based ID formats
+Hands out validated batches of IDs for bulk inserts instead of calling the
+plpgsql generate_*_id() DEFAULT functions once per row.
+Formats match scripts/sql_table_scripts/modification/add_id_format_constraints.sql
+"""
+import math
+import os
+import re
+
+from psycopg2 import sql
+
+# Table -> ID column, prefix, hex length, case and CHECK constraint regex
+ID_FORMATS = {
+    'case_drafts': {
+        'column': 'draft_id',
+        'prefix': '',
+        'hex_length': 7,
+        'uppercase': True,
+        'pattern': re.compile(r'^[0-9A-Fa-f]{7}$'),
+        'db_function': 'generate_draft_id',
+    },
+    'draft_attachments': {
+        'column': 'attachment_id',
+        'prefix': 'd_att_',
+        'hex_length': 8,
+        'uppercase': False,
+        'pattern': re.compile(r'^d_att_[0-9a-f]{8}$'),
+        'db_function': 'generate_draft_attachment_id',
+    },
+    'case_attachments': {
+        'column': 'attachment_id',
+        'prefix': 'c_att_',
+        'hex_length': 8,
+        'uppercase': False,
+        'pattern': re.compile(r'^c_att_[0-9a-f]{8}$'),
+        'db_function': 'generate_case_attachment_id',
+    },
+    'case_comments': {
+        'column': 'comment_id',
+        'prefix': 'cmt_',
+        'hex_length': 8,
+        'uppercase': False,
+        'pattern': re.compile(r'^cmt_[0-9a-f]{8}$'),
+        'db_function': 'generate_comment_id',
+    },
+}
+
+DEFAULT_MAX_ROUNDS = 10
+
+
+def get_id_format(table_name):
+    """Return the ID format definition for a table"""
+    try:
+        return ID_FORMATS[table_name]
+    except KeyError:
+        raise ValueError(
+            f"No ID format defined for table '{table_name}'. "
+            f"Supported tables: {', '.join(sorted(ID_FORMATS))}"
+        )
+
+
+def is_valid_id(table_name, value):
+    """Check a single ID against the table's CHECK constraint format"""
+    id_format = get_id_format(table_name)
+    return bool(id_format['pattern'].match(value))
+
+
+def generate_ids(table_name, count):
+    """
+    Generate `count` candidate IDs for a table in one pass
+    Reads all entropy with a single os.urandom() call (same source quality as
+    gen_random_uuid()) and slices it into IDs. May contain duplicates.
+    """
+    id_format = get_id_format(table_name)
+    if count <= 0:
+        return []
+
+    prefix = id_format['prefix']
+    hex_length = id_format['hex_length']
+    # 4 random bytes -> 8 hex chars per ID, trimmed to hex_length
+    raw = os.urandom(count * 4).hex()
+    if id_format['uppercase']:
+        raw = raw.upper()
+
+    return [prefix + raw[i:i + hex_length] for i in range(0, count * 8, 8)]
+
+
+def find_existing_ids(conn, table_name, ids, lookup_table=None):
+    """
+    Return the subset of `ids` already present in the table (one query)
+    `lookup_table` overrides the table searched (same ID column), e.g. a
+    staging or benchmark copy of the real table.
+    """
+    if not ids:
+        return set()
+
+    id_format = get_id_format(table_name)
+    query = sql.SQL("SELECT {col} FROM {table} WHERE {col} = ANY(%s)").format(
+        col=sql.Identifier(id_format['column']),
+        table=sql.Identifier(lookup_table or table_name)
+    )
+    with conn.cursor() as cur:
+        cur.execute(query, (list(ids),))
+        return {row[0] for row in cur.fetchall()}
+
+
+def allocate_ids(conn, table_name, count, max_rounds=DEFAULT_MAX_ROUNDS, stats=None,
+                 lookup_table=None):
+    """
+    Allocate `count` unique, validated IDs for a bulk insert into `table_name`
+
+    Each round generates replacements for every collision at once - duplicates
+    within the batch and IDs that already exist in the table - so the database
+    is queried once per round rather than once per row.
+    Pass conn=None to skip the existing-ID check (e.g. for an empty table);
+    `lookup_table` is forwarded to find_existing_ids().
+
+    If `stats` is a dict it is filled with generated/in_batch_collisions/
+    existing_collisions/rounds counters.
+
+    Note: the primary key is still the final guard - IDs handed out here are
+    not reserved, so concurrent writers should insert promptly and retry on
+    unique violations.
+    """
+    get_id_format(table_name)
+    if stats is None:
+        stats = {}
+    stats.update({
+        'generated': 0,
+        'in_batch_collisions': 0,
+        'existing_collisions': 0,
+        'rounds': 0,
+    })
+
+    allocated = set()
+    needed = count
+    while needed > 0:
+        if stats['rounds'] >= max_rounds:
+            raise RuntimeError(
+                f"Could not allocate {count} unique IDs for {table_name} "
+                f"after {max_rounds} rounds ({needed} still missing)"
+            )
+        stats['rounds'] += 1
+
+        candidates = generate_ids(table_name, needed)
+        stats['generated'] += len(candidates)
+
+        fresh = set()
+        for candidate in candidates:
+            if not is_valid_id(table_name, candidate):
+                raise ValueError(f"Generated invalid ID for {table_name}: {candidate}")
+            if candidate in allocated or candidate in fresh:
+                stats['in_batch_collisions'] += 1
+            else:
+                fresh.add(candidate)
+
+        if conn is not None:
+            existing = find_existing_ids(conn, table_name, fresh, lookup_table)
+            stats['existing_collisions'] += len(existing)
+            fresh -= existing
+
+        allocated |= fresh
+        needed = count - len(allocated)
+
+    return list(allocated)
+
+
+def expected_collisions(table_name, row_count):
+    """
+    Expected number of duplicate rows (rows - distinct IDs) when `row_count`
+    IDs are drawn independently (the per-row DEFAULT path):
+    n - N * (1 - (1 - 1/N)^n), with N = 16^hex_length
+    """
+    id_format = get_id_format(table_name)
+    space = 16 ** id_format['hex_length']
+    # 1 - (1 - 1/N)^n computed via expm1/log1p to stay precise for huge N
+    distinct_fraction = -math.expm1(row_count * math.log1p(-1 / space))
+    return row_count - space * distinct_fraction
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) != 3:
+        print("Usage: python scripts/id_allocator.py <table_name> <count>")
+        print(f"Tables: {', '.join(sorted(ID_FORMATS))}")
+        sys.exit(1)
+
+    # Offline preview - no existing-ID check against the database
+    for new_id in allocate_ids(None, sys.argv[1], int(sys.argv[2])):
+        print(new_id)
@@ -0,0 +1,635 @@
+"""
+Parallel database provisioning from sql_table_scripts/creation
+Builds a dependency graph from the scripts' FOREIGN KEY references and runs
+independent scripts concurrently on pooled connections:
+
+  Phase 1 (plan):    parse scripts, skip ones already applied (checksum ledger)
+  Phase 2 (ddl):     tables, functions, triggers, constraints, comments - in DAG order
+  Phase 3 (indexes): all CREATE INDEX statements, built in parallel
+
+Read-only verification SELECTs and RAISE NOTICE blocks at the end of each
+script are skipped (and listed in the plan). Applied scripts are recorded in
+schema_provisioning_log so re-runs only apply new scripts. A database that
+already has the tables but no ledger entries is refused; adopt it with
+--baseline, which records those scripts as applied without running them.
+
+Usage:
+    python scripts/provision_db.py                          # database from .env
+    python scripts/provision_db.py --database bench_01 --create
+    python scripts/provision_db.py --dry-run                # print the plan only
+    python scripts/provision_db.py --baseline               # adopt a hand-provisioned DB
+"""
+import re
+import sys
+import time
+import hashlib
+import argparse
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import psycopg2
+from psycopg2 import sql
+from psycopg2.pool import ThreadedConnectionPool
+from db_config import load_db_config
+
+CREATION_DIR = Path(__file__).parent / 'sql_table_scripts' / 'creation'
+LEDGER_TABLE = 'schema_provisioning_log'
+DEFAULT_WORKERS = 4
+
+DOLLAR_TAG = re.compile(r'\$([A-Za-z_][A-Za-z0-9_]*)?\$')
+CREATE_TABLE = re.compile(r'CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?"?(\w+)"?', re.IGNORECASE)
+REFERENCES = re.compile(r'REFERENCES\s+"?(\w+)"?', re.IGNORECASE)
+CREATE_INDEX = re.compile(r'^CREATE\s+(?:UNIQUE\s+)?INDEX\s+', re.IGNORECASE)
+VERIFICATION_SELECT = re.compile(
+    r'\b(information_schema\.|pg_indexes\b|COUNT\s*\(\s*\*\s*\))', re.IGNORECASE
+)
+NOTICE_ONLY_LINE = re.compile(r'^\s*(BEGIN|END;?|RAISE\s+NOTICE\s+.*;)?\s*$', re.IGNORECASE)
+
+
+def split_sql_statements(text):
+    """
+    Split a SQL script into statements on top-level semicolons
+    Understands -- and /* */ comments (dropped), '...' strings and $tag$
+    bodies (kept intact), so function bodies are never split.
+    """
+    statements = []
+    current = []
+    i = 0
+    length = len(text)
+
+    while i < length:
+        char = text[i]
+
+        if text.startswith('--', i):
+            end = text.find('\n', i)
+            i = length if end == -1 else end
+            continue
+
+        if text.startswith('/*', i):
+            end = text.find('*/', i + 2)
+            i = length if end == -1 else end + 2
+            continue
+
+        if char == "'":
+            end = i + 1
+            while end < length:
+                if text[end] == "'":
+                    if text.startswith("''", end):
+                        end += 2
+                        continue
+                    break
+                end += 1
+            current.append(text[i:end + 1])
+            i = end + 1
+            continue
+
+        if char == '$':
+            match = DOLLAR_TAG.match(text, i)
+            if match:
+                tag = match.group(0)
+                end = text.find(tag, match.end())
+                end = length if end == -1 else end + len(tag)
+                current.append(text[i:end])
+                i = end
+                continue
+
+        if char == ';':
+            statement = ''.join(current).strip()
+            if statement:
+                statements.append(statement)
+            current = []
+            i += 1
+            continue
+
+        current.append(char)
+        i += 1
+
+    statement = ''.join(current).strip()
+    if statement:
+        statements.append(statement)
+    return statements
+
+
+def is_verification_statement(statement):
+    """
+    True for trailing verification queries and notice-only DO blocks
+    Only read-only SELECTs against information_schema / pg_indexes or COUNT(*)
+    count as verification - any other SELECT (setval, set_config) is kept.
+    """
+    keyword = statement.split(None, 1)[0].upper()
+    if keyword == 'SELECT':
+        return bool(VERIFICATION_SELECT.search(strip_literals(statement)))
+    if keyword == 'DO':
+        match = DOLLAR_TAG.search(statement)
+        if match:
+            body = statement[match.end():statement.rfind(match.group(0))]
+            return all(NOTICE_ONLY_LINE.match(line) for line in body.splitlines())
+    return False
+
+
+def strip_literals(statement):
+    """Blank out '...' strings and $tag$ bodies so regexes only see SQL keywords"""
+    statement = re.sub(r"'(?:[^']|'')*'", "''", statement)
+    return re.sub(r'(\$(?:[A-Za-z_][A-Za-z0-9_]*)?\$).*?\1', '$$', statement, flags=re.DOTALL)
+
+
+def make_index_idempotent(statement):
+    """
+    CREATE [UNIQUE] INDEX name ... -> ... IF NOT EXISTS name ...
+    so a resumed index phase skips indexes that were already built.
+    Unnamed indexes are rejected - they would be duplicated on resume.
+    CONCURRENTLY is rejected - a failed concurrent build leaves an INVALID
+    index that IF NOT EXISTS would skip, and the tables are empty anyway.
+    """
+    match = CREATE_INDEX.match(statement)
+    if not match:
+        return statement
+    rest = statement[match.end():]
+    if re.match(r'CONCURRENTLY\b', rest, re.IGNORECASE):
+        raise ValueError(f"CREATE INDEX CONCURRENTLY is not supported, drop CONCURRENTLY: {statement}")
+    if re.match(r'IF\s+NOT\s+EXISTS\b', rest, re.IGNORECASE):
+        return statement
+    if re.match(r'ON\b', rest, re.IGNORECASE):
+        raise ValueError(f"Unnamed index cannot be resumed safely, give it a name: {statement}")
+    return statement[:match.end()] + 'IF NOT EXISTS ' + rest
+
+
+def parse_script(path):
+    """Parse one creation script into DDL / index statements and FK dependencies"""
+    text = path.read_text(encoding='utf-8')
+    script = {
+        'name': path.name,
+        'checksum': hashlib.sha256(text.encode('utf-8')).hexdigest(),
+        'tables': set(),
+        'references': set(),
+        'ddl': [],
+        'indexes': [],
+        'skipped': [],
+    }
+
+    for statement in split_sql_statements(text):
+        if is_verification_statement(statement):
+            script['skipped'].append(statement)
+        elif re.match(r'CREATE\s+(UNIQUE\s+)?INDEX\b', statement, re.IGNORECASE):
+            script['indexes'].append(make_index_idempotent(statement))
+        else:
+            script['ddl'].append(statement)
+            keywords = strip_literals(statement)
+            script['tables'].update(t.lower() for t in CREATE_TABLE.findall(keywords))
+            script['references'].update(t.lower() for t in REFERENCES.findall(keywords))
+
+    return script
+
+
+def build_dependency_graph(scripts):
+    """
+    Map each script name to the set of script names it depends on
+    A script depends on whichever script creates a table it REFERENCES.
+    """
+    table_owner = {}
+    for script in scripts:
+        for table in script['tables']:
+            table_owner[table] = script['name']
+
+    graph = {}
+    for script in scripts:
+        deps = set()
+        for table in script['references'] - script['tables']:
+            if table not in table_owner:
+                raise ValueError(
+                    f"{script['name']} references '{table}' but no creation script creates it"
+                )
+            deps.add(table_owner[table])
+        graph[script['name']] = deps
+    return graph
+
+
+def dependency_levels(graph):
+    """Group script names into levels that can run in parallel (Kahn's algorithm)"""
+    remaining = {name: set(deps) for name, deps in graph.items()}
+    levels = []
+    while remaining:
+        ready = sorted(name for name, deps in remaining.items() if not deps)
+        if not ready:
+            raise ValueError(f"Dependency cycle between: {', '.join(sorted(remaining))}")
+        levels.append(ready)
+        for name in ready:
+            del remaining[name]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+    return levels
+
+
+def load_scripts(scripts_dir):
+    """Parse every *.sql in the creation folder"""
+    return [parse_script(path) for path in sorted(Path(scripts_dir).glob('*.sql'))]
+
+
+def print_plan(scripts, graph):
+    """Print the parallel execution plan"""
+    by_name = {script['name']: script for script in scripts}
+    print("\n[*] EXECUTION PLAN:")
+    print("-" * 80)
+    for level, names in enumerate(dependency_levels(graph), 1):
+        print(f"  Level {level}:")
+        for name in names:
+            script = by_name[name]
+            deps = ', '.join(sorted(graph[name])) or 'none'
+            print(f"    - {name:<45} ddl={len(script['ddl']):<3} "
+                  f"indexes={len(script['indexes']):<3} depends on: {deps}")
+            for statement in script['skipped']:
+                summary = ' '.join(statement.split())
+                if len(summary) > 60:
+                    summary = summary[:57] + '...'
+                print(f"        skip: {summary}")
+    print("-" * 80)
+
+
+def connection_config(database=None):
+    """Load db config, optionally pointing at a different database"""
+    config = load_db_config()
+    config = {
+        'host': config['host'],
+        'port': config['port'],
+        'database': config['database'],
+        'user': config['user'],
+        'password': config['password']
+    }
+    if database:
+        config['database'] = database
+    return config
+
+
+def create_database(database):
+    """CREATE DATABASE via the configured database (for ephemeral test DBs)"""
+    conn = psycopg2.connect(**connection_config())
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1 FROM pg_database WHERE datname = %s", (database,))
+            if cur.fetchone():
+                print(f"[*] Database {database} already exists")
+                return
+            cur.execute(sql.SQL("CREATE DATABASE {}").format(sql.Identifier(database)))
+            print(f"[+] Created database {database}")
+    finally:
+        conn.close()
+
+
+def ensure_ledger(conn):
+    """Create the applied-scripts ledger and return {script_name: row}"""
+    with conn.cursor() as cur:
+        cur.execute(sql.SQL("""
+            CREATE TABLE IF NOT EXISTS {} (
+                script_name VARCHAR(255) PRIMARY KEY,
+                checksum VARCHAR(64) NOT NULL,
+                status VARCHAR(20) NOT NULL,
+                ddl_ms INTEGER,
+                index_ms INTEGER,
+                applied_at TIMESTAMPTZ NOT NULL DEFAULT TIMEZONE('UTC', NOW())
+            )
+        """).format(sql.Identifier(LEDGER_TABLE)))
+        cur.execute(sql.SQL("SELECT script_name, checksum, status FROM {}").format(
+            sql.Identifier(LEDGER_TABLE)
+        ))
+        rows = cur.fetchall()
+    conn.commit()
+    return {name: {'checksum': checksum, 'status': status} for name, checksum, status in rows}
+
+
+def find_existing_tables(conn, scripts):
+    """Return the tables created by `scripts` that already exist (to_regclass)"""
+    tables = sorted({table for script in scripts for table in script['tables']})
+    if not tables:
+        return []
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT name FROM unnest(%s::text[]) AS name WHERE to_regclass(name) IS NOT NULL",
+            (tables,)
+        )
+        existing = [row[0] for row in cur.fetchall()]
+    conn.commit()
+    return existing
+
+
+def record_script(conn, script, status, ddl_ms=None, index_ms=None):
+    """Upsert a script's ledger row"""
+    with conn.cursor() as cur:
+        cur.execute(sql.SQL("""
+            INSERT INTO {} (script_name, checksum, status, ddl_ms, index_ms)
+            VALUES (%s, %s, %s, %s, %s)
+            ON CONFLICT (script_name) DO UPDATE SET
+                checksum = EXCLUDED.checksum,
+                status = EXCLUDED.status,
+                ddl_ms = COALESCE(EXCLUDED.ddl_ms, {}.ddl_ms),
+                index_ms = EXCLUDED.index_ms,
+                applied_at = TIMEZONE('UTC', NOW())
+        """).format(sql.Identifier(LEDGER_TABLE), sql.Identifier(LEDGER_TABLE)),
+            (script['name'], script['checksum'], status, ddl_ms, index_ms))
+
+
+def run_script_ddl(pool, script):
+    """Run a script's DDL statements in one transaction and mark it ddl_applied"""
+    conn = pool.getconn()
+    try:
+        start = time.perf_counter()
+        with conn.cursor() as cur:
+            for statement in script['ddl']:
+                cur.execute(statement)
+        ddl_ms = int((time.perf_counter() - start) * 1000)
+        record_script(conn, script, 'ddl_applied', ddl_ms=ddl_ms)
+        conn.commit()
+        return ddl_ms
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        pool.putconn(conn)
+
+
+def run_index(pool, statement):
+    """Build one index in its own transaction"""
+    conn = pool.getconn()
+    try:
+        start = time.perf_counter()
+        with conn.cursor() as cur:
+            cur.execute(statement)
+        conn.commit()
+        return int((time.perf_counter() - start) * 1000)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        pool.putconn(conn)
+
+
+def run_ddl_phase(pool, scripts, graph, workers):
+    """
+    Run scripts' DDL as soon as their dependencies finish
+    At most `workers` scripts are submitted at a time, and the first failure
+    stops scheduling: nothing new is started and queued work is cancelled.
+    Scripts already in flight still finish.
+    """
+    by_name = {script['name']: script for script in scripts}
+    pending = {name: set(graph[name]) for name in by_name}
+    timings = {}
+
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        running = {}
+        while pending or running:
+            ready = sorted(name for name, deps in pending.items() if not deps)
+            for name in ready[:workers - len(running)]:
+                del pending[name]
+                running[executor.submit(run_script_ddl, pool, by_name[name])] = name
+
+            if not running:
+                raise ValueError(f"Dependency cycle between: {', '.join(sorted(pending))}")
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    timings[name] = future.result()
+                except Exception:
+                    print(f"  [-] {name} failed - stopping DDL phase")
+                    raise
+                print(f"  [+] {name:<45} {timings[name]:>7} ms")
+                for deps in pending.values():
+                    deps.discard(name)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    return timings
+
+
+def run_index_phase(pool, scripts, workers):
+    """Build every deferred index in parallel, then mark scripts applied"""
+    timings = {script['name']: 0 for script in scripts}
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        futures = {
+            executor.submit(run_index, pool, statement): script['name']
+            for script in scripts
+            for statement in script['indexes']
+        }
+        for future in futures:
+            timings[futures[future]] += future.result()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    conn = pool.getconn()
+    try:
+        for script in scripts:
+            record_script(conn, script, 'applied', index_ms=timings[script['name']])
+        conn.commit()
+    finally:
+        pool.putconn(conn)
+
+    for script in scripts:
+        if script['indexes']:
+            print(f"  [+] {script['name']:<45} {len(script['indexes']):>3} indexes "
+                  f"{timings[script['name']]:>7} ms")
+    return timings
+
+
+def select_scripts(scripts, ledger):
+    """
+    Split scripts into (ddl_todo, index_todo) using the ledger
+    Applied scripts with a matching checksum are skipped; a changed checksum
+    on an applied script is an error (creation scripts are not re-runnable).
+    """
+    ddl_todo, index_todo = [], []
+    for script in scripts:
+        row = ledger.get(script['name'])
+        if row is None:
+            ddl_todo.append(script)
+            index_todo.append(script)
+        elif row['checksum'] != script['checksum']:
+            raise ValueError(
+                f"{script['name']} changed since it was applied "
+                f"(checksum {row['checksum'][:12]} -> {script['checksum'][:12]}); "
+                f"write a modification script instead"
+            )
+        elif row['status'] == 'ddl_applied':
+            index_todo.append(script)
+    return ddl_todo, index_todo
+
+
+def select_baseline_scripts(scripts, existing_tables):
+    """
+    Split unrecorded scripts into (to_record, pending) for --baseline
+    A script is recorded when all of its tables exist; a script with only some
+    of its tables present is an error (the schema is half-provisioned).
+    """
+    existing_tables = set(existing_tables)
+    to_record, pending = [], []
+    for script in scripts:
+        present = script['tables'] & existing_tables
+        if script['tables'] and present == script['tables']:
+            to_record.append(script)
+        elif present:
+            raise ValueError(
+                f"{script['name']}: only some of its tables exist "
+                f"({', '.join(sorted(present))}); fix the schema by hand first"
+            )
+        else:
+            pending.append(script)
+    return to_record, pending
+
+
+def baseline(database=None, scripts_dir=CREATION_DIR):
+    """
+    Adopt an existing database: record scripts whose tables already exist as
+    applied (no DDL is run). Returns (recorded, pending) script names.
+    """
+    scripts = load_scripts(scripts_dir)
+    conn = psycopg2.connect(**connection_config(database))
+    try:
+        ledger = ensure_ledger(conn)
+        ddl_todo, _ = select_scripts(scripts, ledger)
+        existing = find_existing_tables(conn, ddl_todo)
+        to_record, pending = select_baseline_scripts(ddl_todo, existing)
+        for script in to_record:
+            record_script(conn, script, 'applied')
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    for script in to_record:
+        print(f"  [+] baselined {script['name']}")
+    for script in pending:
+        print(f"  [*] pending   {script['name']} (tables missing - run without --baseline)")
+    return [script['name'] for script in to_record], [script['name'] for script in pending]
+
+
+def provision(database=None, scripts_dir=CREATION_DIR, workers=DEFAULT_WORKERS):
+    """
+    Provision a database from the creation scripts; returns per-phase timings
+    Refuses to run DDL when tables it would create already exist (e.g. a
+    database provisioned by hand, with an empty ledger) - some scripts start
+    with DROP TABLE ... CASCADE. Use baseline() to adopt such a database.
+    """
+    phase_times = {}
+
+    start = time.perf_counter()
+    scripts = load_scripts(scripts_dir)
+    graph = build_dependency_graph(scripts)
+    pool = ThreadedConnectionPool(1, workers, **connection_config(database))
+    try:
+        conn = pool.getconn()
+        try:
+            ledger = ensure_ledger(conn)
+        finally:
+            pool.putconn(conn)
+
+        ddl_todo, index_todo = select_scripts(scripts, ledger)
+
+        conn = pool.getconn()
+        try:
+            existing = find_existing_tables(conn, ddl_todo)
+        finally:
+            pool.putconn(conn)
+        if existing:
+            raise ValueError(
+                f"Tables already exist but are not recorded in {LEDGER_TABLE}: "
+                f"{', '.join(existing)}. Refusing to run creation scripts against them "
+                f"(run with --baseline to record them as applied)"
+            )
+
+        todo_names = {script['name'] for script in ddl_todo}
+        # Dependencies already applied on an earlier run are satisfied
+        todo_graph = {name: graph[name] & todo_names for name in todo_names}
+        phase_times['plan'] = time.perf_counter() - start
+
+        skipped = len(scripts) - len(index_todo)
+        print(f"\n[*] {len(scripts)} scripts: {len(ddl_todo)} to apply, "
+              f"{len(index_todo) - len(ddl_todo)} to resume at index phase, "
+              f"{skipped} already applied")
+        if ddl_todo:
+            print_plan(ddl_todo, todo_graph)
+
+        print("\n[*] PHASE: ddl")
+        start = time.perf_counter()
+        run_ddl_phase(pool, ddl_todo, todo_graph, workers)
+        phase_times['ddl'] = time.perf_counter() - start
+
+        print("\n[*] PHASE: indexes")
+        start = time.perf_counter()
+        run_index_phase(pool, index_todo, workers)
+        phase_times['indexes'] = time.perf_counter() - start
+    finally:
+        pool.closeall()
+
+    return phase_times
+
+
+def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Provision a database from the creation scripts")
+    parser.add_argument('--database', help="Target database (default: DB_NAME from config)")
+    parser.add_argument('--create', action='store_true',
+                        help="CREATE DATABASE --database first (ephemeral test/benchmark DBs)")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f"Parallel connections (default: {DEFAULT_WORKERS})")
+    parser.add_argument('--scripts-dir', default=str(CREATION_DIR),
+                        help="Folder of creation scripts")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="Parse the scripts and print the plan without connecting")
+    parser.add_argument('--baseline', action='store_true',
+                        help="Record scripts whose tables already exist as applied, "
+                             "without running them")
+    args = parser.parse_args()
+
+    print("\n" + "="*80)
+    print("DATABASE PROVISIONING".center(80))
+    print("="*80)
+
+    if args.dry_run:
+        scripts = load_scripts(args.scripts_dir)
+        print_plan(scripts, build_dependency_graph(scripts))
+        return
+
+    if args.create:
+        if not args.database:
+            print("[-] --create requires --database")
+            sys.exit(1)
+        create_database(args.database)
+
+    if args.baseline:
+        print("\n[*] Baselining existing tables (no DDL is run)...")
+        try:
+            recorded, pending = baseline(args.database, args.scripts_dir)
+        except FileNotFoundError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        except (psycopg2.Error, ValueError) as e:
+            print(f"\n[-] Baseline failed: {e}")
+            sys.exit(1)
+        print(f"\n[+] Baseline complete: {len(recorded)} recorded, {len(pending)} pending\n")
+        return
+
+    try:
+        start = time.perf_counter()
+        phase_times = provision(args.database, args.scripts_dir, args.workers)
+        total = time.perf_counter() - start
+    except FileNotFoundError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    except (psycopg2.Error, ValueError) as e:
+        print(f"\n[-] Provisioning failed: {e}")
+        sys.exit(1)
+
+    print("\n[*] PHASE TIMINGS:")
+    print("-" * 80)
+    for phase, seconds in phase_times.items():
+        print(f"  {phase:<10} {seconds:>8.2f} s")
+    print(f"  {'total':<10} {total:>8.2f} s")
+    print("\n[+] Provisioning complete!\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""
+Benchmark: plpgsql DEFAULT ID generation vs bulk ID allocation
+Compares insert throughput and measured collision rates for the UUID-based
+ID formats. All work happens in TEMP tables - real tables are never touched.
+
+Usage:
+    python scripts/testing_db/benchmark_id_allocation.py --rows 1000000
+    python scripts/testing_db/benchmark_id_allocation.py --tables case_drafts case_comments
+"""
+import sys
+import time
+import argparse
+from pathlib import Path
+
+# Add parent directory to path to import db_config / id_allocator
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import psycopg2
+from psycopg2 import sql
+from psycopg2.extras import execute_values
+from db_config import load_db_config
+from id_allocator import ID_FORMATS, allocate_ids, expected_collisions
+
+TARGET_ROWS = 100_000_000  # documented 100M-row volume target
+
+def connect_to_db():
+    """Establish connection to the database"""
+    try:
+        config = load_db_config()
+        conn = psycopg2.connect(
+            host=config['host'],
+            port=config['port'],
+            database=config['database'],
+            user=config['user'],
+            password=config['password']
+        )
+        return conn
+    except FileNotFoundError as e:
+        print(f"Error: {e}")
+        exit(1)
+    except psycopg2.Error as e:
+        print(f"Error connecting to database: {e}")
+        exit(1)
+
+def function_exists(conn, function_name):
+    """Check whether the plpgsql ID generator is installed"""
+    with conn.cursor() as cur:
+        cur.execute("SELECT to_regprocedure(%s) IS NOT NULL", (f"{function_name}()",))
+        return cur.fetchone()[0]
+
+def bench_table_names(table_name):
+    """TEMP table names used for each path"""
+    return f"bench_default_{table_name}", f"bench_alloc_{table_name}"
+
+def create_bench_tables(conn, table_name, include_default=True):
+    """
+    Create the TEMP tables for both paths
+    The DEFAULT table has a non-unique index so duplicates are counted instead
+    of aborting the batch; the allocator table has the real PK + CHECK.
+    """
+    id_format = ID_FORMATS[table_name]
+    default_table, alloc_table = bench_table_names(table_name)
+    id_length = len(id_format['prefix']) + id_format['hex_length']
+    col = sql.Identifier(id_format['column'])
+
+    with conn.cursor() as cur:
+        for name in (default_table, alloc_table):
+            cur.execute(sql.SQL("DROP TABLE IF EXISTS {}").format(sql.Identifier(name)))
+
+        if include_default:
+            cur.execute(sql.SQL("""
+                CREATE TEMP TABLE {table} (
+                    {col} VARCHAR({length}) DEFAULT {func}(),
+                    payload INTEGER NOT NULL
+                )
+            """).format(
+                table=sql.Identifier(default_table),
+                col=col,
+                length=sql.Literal(id_length),
+                func=sql.Identifier(id_format['db_function'])
+            ))
+            cur.execute(sql.SQL("CREATE INDEX ON {} ({})").format(
+                sql.Identifier(default_table), col
+            ))
+
+        cur.execute(sql.SQL("""
+            CREATE TEMP TABLE {table} (
+                {col} VARCHAR({length}) PRIMARY KEY CHECK ({col} ~ {pattern}),
+                payload INTEGER NOT NULL
+            )
+        """).format(
+            table=sql.Identifier(alloc_table),
+            col=col,
+            length=sql.Literal(id_length),
+            pattern=sql.Literal(id_format['pattern'].pattern)
+        ))
+    conn.commit()
+
+def run_default_path(conn, table_name, rows, batch_size):
+    """
+    Insert rows letting the column DEFAULT call the plpgsql function per row
+    Sends the same client-side payload rows as run_allocator_path() (ID column
+    left out), so the two paths differ only in how IDs are produced.
+    """
+    default_table, _ = bench_table_names(table_name)
+    id_format = ID_FORMATS[table_name]
+    insert = sql.SQL("INSERT INTO {} (payload) VALUES %s").format(
+        sql.Identifier(default_table)
+    )
+
+    start = time.perf_counter()
+    with conn.cursor() as cur:
+        for offset in range(0, rows, batch_size):
+            count = min(batch_size, rows - offset)
+            execute_values(
+                cur, insert.as_string(conn),
+                [(offset + i + 1,) for i in range(count)],
+                page_size=count
+            )
+            conn.commit()
+    elapsed = time.perf_counter() - start
+
+    with conn.cursor() as cur:
+        cur.execute(sql.SQL("SELECT COUNT(*) - COUNT(DISTINCT {}) FROM {}").format(
+            sql.Identifier(id_format['column']),
+            sql.Identifier(default_table)
+        ))
+        collisions = cur.fetchone()[0]
+
+    return {'elapsed': elapsed, 'collisions': collisions}
+
+def run_allocator_path(conn, table_name, rows, batch_size):
+    """Insert rows with IDs handed out in validated batches by id_allocator"""
+    _, alloc_table = bench_table_names(table_name)
+    id_format = ID_FORMATS[table_name]
+    insert = sql.SQL("INSERT INTO {} ({}, payload) VALUES %s").format(
+        sql.Identifier(alloc_table),
+        sql.Identifier(id_format['column'])
+    )
+
+    totals = {'generated': 0, 'in_batch_collisions': 0, 'existing_collisions': 0, 'rounds': 0}
+    start = time.perf_counter()
+    with conn.cursor() as cur:
+        for offset in range(0, rows, batch_size):
+            count = min(batch_size, rows - offset)
+            stats = {}
+            ids = allocate_ids(conn, table_name, count, stats=stats, lookup_table=alloc_table)
+            for key in totals:
+                totals[key] += stats[key]
+            execute_values(
+                cur, insert.as_string(conn),
+                [(new_id, offset + i + 1) for i, new_id in enumerate(ids)],
+                page_size=count
+            )
+            conn.commit()
+    elapsed = time.perf_counter() - start
+
+    return {'elapsed': elapsed, **totals}
+
+def drop_bench_tables(conn, table_name):
+    """Drop the TEMP tables for a table"""
+    with conn.cursor() as cur:
+        for name in bench_table_names(table_name):
+            cur.execute(sql.SQL("DROP TABLE IF EXISTS {}").format(sql.Identifier(name)))
+    conn.commit()
+
+def print_report(table_name, rows, default_result, alloc_result):
+    """Print throughput and collision comparison for one table"""
+    print("\n" + "="*80)
+    print(f"TABLE: {table_name} ({rows:,} rows)")
+    print("="*80)
+
+    print(f"\n{'Path':<25} {'Seconds':>10} {'Rows/sec':>15} {'Collisions':>12}")
+    print("-" * 80)
+    if default_result:
+        print(f"{'plpgsql DEFAULT':<25} {default_result['elapsed']:>10.2f} "
+              f"{rows / default_result['elapsed']:>15,.0f} "
+              f"{default_result['collisions']:>12,}")
+    else:
+        print(f"{'plpgsql DEFAULT':<25} {'skipped (function not installed)':>40}")
+
+    alloc_collisions = alloc_result['in_batch_collisions'] + alloc_result['existing_collisions']
+    print(f"{'bulk allocator':<25} {alloc_result['elapsed']:>10.2f} "
+          f"{rows / alloc_result['elapsed']:>15,.0f} "
+          f"{alloc_collisions:>12,}  ({alloc_result['rounds']} allocation rounds)")
+
+    print("\n[*] COLLISION RATES:")
+    print("-" * 80)
+    if default_result:
+        print(f"  DEFAULT path (unretried):     {default_result['collisions'] / rows:.6%} "
+              f"of rows would violate the PK")
+    print(f"  Allocator (caught + retried): "
+          f"{alloc_collisions / alloc_result['generated']:.6%} of candidates")
+    print(f"  Expected duplicate rows at {rows:,}: "
+          f"{expected_collisions(table_name, rows):,.1f}")
+    print(f"  Expected duplicate rows at {TARGET_ROWS:,}: "
+          f"{expected_collisions(table_name, TARGET_ROWS):,.0f}")
+
+def main():
+    """Run the benchmark for the selected tables"""
+    parser = argparse.ArgumentParser(description="Benchmark ID generation paths")
+    parser.add_argument('--rows', type=int, default=1_000_000,
+                        help="Rows to insert per table and path (default: 1,000,000)")
+    parser.add_argument('--batch-size', type=int, default=10_000,
+                        help="Rows per INSERT / allocation batch (default: 10,000)")
+    parser.add_argument('--tables', nargs='+', choices=sorted(ID_FORMATS),
+                        default=sorted(ID_FORMATS), help="Tables to benchmark")
+    args = parser.parse_args()
+    if args.rows < 1:
+        parser.error("--rows must be at least 1")
+    if args.batch_size < 1:
+        parser.error("--batch-size must be at least 1")
+
+    print("\n" + "="*80)
+    print("ID GENERATION BENCHMARK".center(80))
+    print("="*80)
+
+    print("\n[*] Connecting to database...")
+    conn = connect_to_db()
+    print("[+] Connected successfully!")
+
+    try:
+        for table_name in args.tables:
+            print(f"\n[*] Benchmarking {table_name}...")
+            db_function = ID_FORMATS[table_name]['db_function']
+            include_default = function_exists(conn, db_function)
+            if not include_default:
+                print(f"[!] {db_function}() not installed - benchmarking allocator only")
+
+            create_bench_tables(conn, table_name, include_default)
+            default_result = None
+            if include_default:
+                default_result = run_default_path(conn, table_name, args.rows, args.batch_size)
+            alloc_result = run_allocator_path(conn, table_name, args.rows, args.batch_size)
+
+            print_report(table_name, args.rows, default_result, alloc_result)
+            drop_bench_tables(conn, table_name)
+    except psycopg2.Error as e:
+        conn.rollback()
+        print(f"\n[-] Benchmark failed: {e}")
+    finally:
+        conn.close()
+        print("\n[*] Database connection closed.\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add scripts directory to path to import id_allocator
+sys.path.insert(0, str(Path(__file__).parent.parent / 'scripts'))
+
+import id_allocator
+from id_allocator import (
+    ID_FORMATS,
+    allocate_ids,
+    expected_collisions,
+    generate_ids,
+    get_id_format,
+)
+
+
+@pytest.mark.parametrize('table_name', sorted(ID_FORMATS))
+def test_generate_ids_match_constraint_pattern(table_name):
+    ids = generate_ids(table_name, 1000)
+    assert len(ids) == 1000
+    assert all(ID_FORMATS[table_name]['pattern'].match(new_id) for new_id in ids)
+
+
+def test_generate_ids_case_drafts_uppercase():
+    assert all(new_id == new_id.upper() for new_id in generate_ids('case_drafts', 100))
+
+
+def test_generate_ids_empty():
+    assert generate_ids('case_comments', 0) == []
+
+
+@pytest.mark.parametrize('table_name', sorted(ID_FORMATS))
+def test_allocate_ids_returns_unique_ids_and_stats(table_name):
+    stats = {}
+    ids = allocate_ids(None, table_name, 5000, stats=stats)
+    assert len(ids) == 5000
+    assert len(set(ids)) == 5000
+    assert stats['generated'] == 5000 + stats['in_batch_collisions']
+    assert stats['existing_collisions'] == 0
+    assert stats['rounds'] >= 1
+
+
+def test_allocate_ids_raises_when_rounds_run_out(monkeypatch):
+    monkeypatch.setattr(id_allocator, 'generate_ids', lambda table_name, count: ['AAAAAAA'] * count)
+    with pytest.raises(RuntimeError, match='after 3 rounds'):
+        allocate_ids(None, 'case_drafts', 2, max_rounds=3)
+
+
+@pytest.mark.parametrize('table_name, row_count', [
+    ('case_drafts', 10_000),
+    ('case_comments', 100_000),
+])
+def test_expected_collisions_matches_birthday_bound_for_small_n(table_name, row_count):
+    space = 16 ** ID_FORMATS[table_name]['hex_length']
+    assert expected_collisions(table_name, row_count) == pytest.approx(
+        row_count ** 2 / (2 * space), rel=0.01
+    )
+
+
+def test_get_id_format_rejects_unknown_table():
+    with pytest.raises(ValueError, match="No ID format defined for table 'cases'"):
+        get_id_format('cases')
@@ -0,0 +1,274 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add scripts directory to path to import provision_db
+sys.path.insert(0, str(Path(__file__).parent.parent / 'scripts'))
+
+import provision_db
+from provision_db import (
+    CREATION_DIR,
+    build_dependency_graph,
+    dependency_levels,
+    is_verification_statement,
+    load_scripts,
+    make_index_idempotent,
+    run_ddl_phase,
+    select_baseline_scripts,
+    select_scripts,
+    split_sql_statements,
+)
+
+
+def make_script(name, tables=(), references=(), checksum='abc'):
+    return {
+        'name': name,
+        'checksum': checksum,
+        'tables': set(tables),
+        'references': set(references),
+        'ddl': [],
+        'indexes': [],
+        'skipped': [],
+    }
+
+
+# ----------------------------------------------------------------------------
+# split_sql_statements
+# ----------------------------------------------------------------------------
+
+def test_split_drops_comments():
+    text = """
+    -- leading comment; with a semicolon
+    CREATE TABLE a (id INT); /* block; comment */
+    CREATE TABLE b (id INT) -- trailing
+    ;
+    """
+    assert split_sql_statements(text) == ['CREATE TABLE a (id INT)', 'CREATE TABLE b (id INT)']
+
+
+def test_split_keeps_strings_with_escaped_quotes_and_semicolons():
+    text = "COMMENT ON TABLE a IS 'it''s; -- not a comment'; SELECT 1;"
+    assert split_sql_statements(text) == [
+        "COMMENT ON TABLE a IS 'it''s; -- not a comment'",
+        'SELECT 1',
+    ]
+
+
+def test_split_keeps_dollar_quoted_function_bodies():
+    text = """
+    CREATE FUNCTION f() RETURNS int AS $$
+    BEGIN
+        PERFORM 1; -- inside body
+        RETURN 1;
+    END;
+    $$ LANGUAGE plpgsql;
+    CREATE FUNCTION g() RETURNS text AS $fn$ SELECT 'a;$$b' $fn$ LANGUAGE sql;
+    """
+    statements = split_sql_statements(text)
+    assert len(statements) == 2
+    assert 'PERFORM 1; -- inside body' in statements[0]
+    assert statements[0].endswith('$$ LANGUAGE plpgsql')
+    assert statements[1] == "CREATE FUNCTION g() RETURNS text AS $fn$ SELECT 'a;$$b' $fn$ LANGUAGE sql"
+
+
+def test_split_check_constraint_regex_is_not_a_dollar_tag():
+    text = "ALTER TABLE a ADD CHECK (id ~ '^[0-9A-F]{7}$'); SELECT 1;"
+    assert split_sql_statements(text) == [
+        "ALTER TABLE a ADD CHECK (id ~ '^[0-9A-F]{7}$')",
+        'SELECT 1',
+    ]
+
+
+# ----------------------------------------------------------------------------
+# Statement classification
+# ----------------------------------------------------------------------------
+
+@pytest.mark.parametrize('statement', [
+    "SELECT 'a' AS table_name, COUNT(*) AS row_count FROM a",
+    "SELECT indexname, indexdef FROM pg_indexes WHERE tablename = 'a'",
+    "SELECT tc.constraint_name FROM information_schema.table_constraints tc",
+    "DO $$\nBEGIN\n    RAISE NOTICE 'done';\nEND $$",
+])
+def test_verification_statements_are_skipped(statement):
+    assert is_verification_statement(statement)
+
+
+@pytest.mark.parametrize('statement', [
+    "SELECT setval('a_id_seq', 100)",
+    "SELECT set_config('search_path', 'public', false)",
+    "SELECT 'COUNT(*) FROM pg_indexes'",
+    "DO $$\nBEGIN\n    UPDATE a SET id = 1;\nEND $$",
+])
+def test_setup_statements_are_kept(statement):
+    assert not is_verification_statement(statement)
+
+
+@pytest.mark.parametrize('statement, expected', [
+    ('CREATE INDEX idx_a ON a(id)', 'CREATE INDEX IF NOT EXISTS idx_a ON a(id)'),
+    ('CREATE UNIQUE INDEX idx_a ON a(id)', 'CREATE UNIQUE INDEX IF NOT EXISTS idx_a ON a(id)'),
+    ('CREATE INDEX IF NOT EXISTS idx_a ON a(id)', 'CREATE INDEX IF NOT EXISTS idx_a ON a(id)'),
+])
+def test_make_index_idempotent(statement, expected):
+    assert make_index_idempotent(statement) == expected
+
+
+def test_unnamed_index_is_rejected():
+    with pytest.raises(ValueError, match='Unnamed index'):
+        make_index_idempotent('CREATE INDEX ON a(id)')
+
+
+@pytest.mark.parametrize('statement', [
+    'CREATE INDEX CONCURRENTLY idx_a ON a(id)',
+    'CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS idx_a ON a(id)',
+    'CREATE INDEX CONCURRENTLY ON a(id)',
+])
+def test_concurrent_index_is_rejected(statement):
+    with pytest.raises(ValueError, match='CONCURRENTLY is not supported'):
+        make_index_idempotent(statement)
+
+
+# ----------------------------------------------------------------------------
+# Dependency graph
+# ----------------------------------------------------------------------------
+
+def test_creation_scripts_plan():
+    scripts = load_scripts(CREATION_DIR)
+    assert len(scripts) == 12
+    assert dependency_levels(build_dependency_graph(scripts)) == [
+        [
+            'create_account_table.sql',
+            'create_case_attachments_table.sql',
+            'create_case_drafts_table.sql',
+            'create_case_reference_numbers_table.sql',
+            'create_cases_table.sql',
+            'create_employee_table.sql',
+            'create_service_parts_table.sql',
+        ],
+        [
+            'create_case_comments_table.sql',
+            'create_contact_table.sql',
+            'create_draft_attachments_table.sql',
+            'create_inventory_table.sql',
+            'create_technician_table.sql',
+        ],
+    ]
+
+
+def test_creation_scripts_defer_indexes_and_skip_verification():
+    scripts = {script['name']: script for script in load_scripts(CREATION_DIR)}
+    cases = scripts['create_cases_table.sql']
+    assert len(cases['indexes']) == 9
+    assert all('IF NOT EXISTS' in statement for statement in cases['indexes'])
+    assert not any(statement.upper().startswith('SELECT') for statement in cases['ddl'])
+    assert len(cases['skipped']) == 2
+
+
+def test_dependency_cycle_is_detected():
+    scripts = [
+        make_script('a.sql', tables=['a'], references=['b']),
+        make_script('b.sql', tables=['b'], references=['a']),
+    ]
+    with pytest.raises(ValueError, match='Dependency cycle'):
+        dependency_levels(build_dependency_graph(scripts))
+
+
+def test_unknown_reference_is_rejected():
+    scripts = [make_script('a.sql', tables=['a'], references=['missing'])]
+    with pytest.raises(ValueError, match="references 'missing'"):
+        build_dependency_graph(scripts)
+
+
+# ----------------------------------------------------------------------------
+# Ledger handling
+# ----------------------------------------------------------------------------
+
+def test_select_scripts_new_database():
+    scripts = [make_script('a.sql'), make_script('b.sql')]
+    assert select_scripts(scripts, {}) == (scripts, scripts)
+
+
+def test_select_scripts_skips_applied():
+    scripts = [make_script('a.sql')]
+    ledger = {'a.sql': {'checksum': 'abc', 'status': 'applied'}}
+    assert select_scripts(scripts, ledger) == ([], [])
+
+
+def test_select_scripts_resumes_from_ddl_applied():
+    scripts = [make_script('a.sql'), make_script('b.sql')]
+    ledger = {'a.sql': {'checksum': 'abc', 'status': 'ddl_applied'}}
+    ddl_todo, index_todo = select_scripts(scripts, ledger)
+    assert [script['name'] for script in ddl_todo] == ['b.sql']
+    assert [script['name'] for script in index_todo] == ['a.sql', 'b.sql']
+
+
+def test_select_baseline_scripts():
+    scripts = [
+        make_script('a.sql', tables=['a']),
+        make_script('b.sql', tables=['b']),
+    ]
+    to_record, pending = select_baseline_scripts(scripts, ['a'])
+    assert [script['name'] for script in to_record] == ['a.sql']
+    assert [script['name'] for script in pending] == ['b.sql']
+
+
+def test_select_baseline_scripts_rejects_partial_tables():
+    scripts = [make_script('a.sql', tables=['a', 'a_audit'])]
+    with pytest.raises(ValueError, match='only some of its tables exist'):
+        select_baseline_scripts(scripts, ['a'])
+
+
+def test_select_scripts_checksum_mismatch():
+    scripts = [make_script('a.sql', checksum='new')]
+    ledger = {'a.sql': {'checksum': 'old', 'status': 'applied'}}
+    with pytest.raises(ValueError, match='changed since it was applied'):
+        select_scripts(scripts, ledger)
+
+
+# ----------------------------------------------------------------------------
+# DDL phase failure handling
+# ----------------------------------------------------------------------------
+
+def test_ddl_failure_stops_scheduling(monkeypatch):
+    scripts = load_scripts(CREATION_DIR)
+    graph = build_dependency_graph(scripts)
+    started = []
+
+    def fake_run_script_ddl(pool, script):
+        started.append(script['name'])
+        if script['name'] == 'create_account_table.sql':
+            raise RuntimeError('relation "account" already exists')
+        return 0
+
+    monkeypatch.setattr(provision_db, 'run_script_ddl', fake_run_script_ddl)
+    with pytest.raises(RuntimeError):
+        run_ddl_phase(None, scripts, graph, workers=1)
+    assert started == ['create_account_table.sql']
+
+
+def test_provision_refuses_existing_tables_without_ledger(monkeypatch):
+    class FakePool:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def getconn(self):
+            return None
+
+        def putconn(self, conn):
+            pass
+
+        def closeall(self):
+            pass
+
+    def fail_if_called(*args, **kwargs):
+        raise AssertionError('DDL must not run against existing tables')
+
+    monkeypatch.setattr(provision_db, 'ThreadedConnectionPool', FakePool)
+    monkeypatch.setattr(provision_db, 'connection_config', lambda database=None: {})
+    monkeypatch.setattr(provision_db, 'ensure_ledger', lambda conn: {})
+    monkeypatch.setattr(provision_db, 'find_existing_tables',
+                        lambda conn, scripts: ['case_attachments'])
+    monkeypatch.setattr(provision_db, 'run_ddl_phase', fail_if_called)
+
+    with pytest.raises(ValueError, match='--baseline'):
+        provision_db.provision()